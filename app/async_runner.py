@@ -0,0 +1,56 @@
+"""Long-lived background event loop for running coroutines from sync code."""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its thread on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-runner", daemon=True).start()
+        return _loop
+
+
+def run(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine on the shared loop and block until it completes.
+
+    Unlike ``asyncio.run``, the loop outlives the call, so pooled async clients
+    (HTTP sessions, connection pools) stay usable across calls.
+    """
+    return submit(coro).result(timeout)
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> "Future[T]":
+    """Schedule a coroutine on the shared loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound work."""
+    global _cpu_pool
+    with _lock:
+        if _cpu_pool is None:
+            # Spawn rather than fork: the parent already runs the loop and Streamlit threads.
+            _cpu_pool = ProcessPoolExecutor(
+                max_workers=max(1, (os.cpu_count() or 2) // 2),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _cpu_pool
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    """Run a picklable CPU-bound function in the process pool without blocking the loop."""
+    return await asyncio.get_running_loop().run_in_executor(get_cpu_pool(), func, *args)
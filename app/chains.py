@@ -1,42 +1,86 @@
 """Chain module for LLM operations."""
 
+import asyncio
+import atexit
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 
-from dotenv import load_dotenv
+import httpx
+import msgspec
 from langchain_groq import ChatGroq
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.exceptions import OutputParserException
 
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character budget without a tokenizer.
+    tiktoken = None
+
+from async_runner import run
+from llm_cache import LLMCache, make_key
 from logger_utils import get_logger, safe_execution
 
-load_dotenv()
 logger = get_logger("Chain")
 
 
+class Job(msgspec.Struct):
+    """Shape of a job posting extracted by the LLM; unknown fields are ignored."""
+
+    role: Optional[str] = ""
+    experience: Any = ""
+    skills: Union[List[str], str, None] = []
+    description: Optional[str] = ""
+
+
+def _skill_name(skill: Any) -> str:
+    """Reduce one extracted skill, which the model sometimes emits as an object, to its name."""
+    if isinstance(skill, dict):
+        skill = skill.get("name") or skill.get("skill") or next(
+            (value for value in skill.values() if isinstance(value, str)), ""
+        )
+    return str(skill).strip() if skill is not None else ""
+
+
+def _normalize(value: Any) -> Any:
+    """Case- and whitespace-fold strings, including inside lists, for comparing jobs."""
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
 class Chain:
     """Encapsulates LLM operations for job extraction and cold email generation.."""
 
-    _JOB_PROMPT = PromptTemplate.from_template("""
-### SCRAPED TEXT:
-{page_data}
+    MAX_CONCURRENCY = 8
+    MAX_PAGE_TOKENS = 6000
+    CHUNK_TOKENS = 3500
+    CHUNK_OVERLAP = 200
+    CHARS_PER_TOKEN = 4
 
-### INSTRUCTION:
-Extract job postings from the text and return valid JSON containing:
-`role`, `experience`, `skills`, and `description`.
+    _JOB_INSTRUCTION = """
+Extract job postings from the scraped careers page text provided by the user and
+return valid JSON containing: `role`, `experience`, `skills`, and `description`.
 Return only the JSON.
-""")
+"""
 
-    _EMAIL_PROMPT = PromptTemplate.from_template("""
-### JOB DESCRIPTION:
-{job_description}
-
-### INSTRUCTION:
+    _EMAIL_INSTRUCTION = """
 You are Kalash, a passionate student developer specializing in AI and software.
-Write a concise, personalized cold email for the above job, showing enthusiasm,
-relevant projects, and proof links: {link_list}. Output email only.
-""")
+Write a concise, personalized cold email for the job described by the user, showing
+enthusiasm, relevant projects, and the proof links provided. Output email only.
+"""
+
+    # Static instructions lead as the system message so providers can reuse the cached prefix.
+    _JOB_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", _JOB_INSTRUCTION),
+        ("user", "### SCRAPED TEXT:\n{page_data}"),
+    ])
+
+    _EMAIL_PROMPT = ChatPromptTemplate.from_messages([
+        ("system", _EMAIL_INSTRUCTION),
+        ("user", "### JOB DESCRIPTION:\n{job_description}\n\n### PROOF LINKS:\n{link_list}"),
+    ])
 
     def __init__(self):
         """Initialize LLM connection."""
@@ -44,35 +88,249 @@ relevant projects, and proof links: {link_list}. Output email only.
         if not api_key:
             raise EnvironmentError("Missing GROQ_API_KEY in environment.")
 
+        # Pooled HTTP/2 clients let concurrent calls share warm TLS connections.
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=60)
+        self._http = httpx.AsyncClient(http2=True, limits=limits)
+        self._http_sync = httpx.Client(http2=True, limits=limits)
         self.llm = ChatGroq(
             model="llama-3.1-8b-instant",
             temperature=0,
-            groq_api_key=api_key
+            groq_api_key=api_key,
+            http_client=self._http_sync,
+            http_async_client=self._http
         )
-        self._parser = JsonOutputParser()
+        self._extract_chain = self._JOB_PROMPT | self.llm
+        self._email_chain = self._EMAIL_PROMPT | self.llm
+        self._encoding = self._load_encoding()
+        self._cache = LLMCache()
+        atexit.register(self.close)
         logger.info("Chain initialized successfully.")
 
+    @staticmethod
+    def _load_encoding():
+        """Load the tokenizer, falling back to a character budget if it is unavailable."""
+        if tiktoken is None:
+            return None
+        try:
+            # The first call downloads the BPE file, which fails on offline hosts.
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning("tiktoken encoding unavailable (%s); splitting pages by characters.", e)
+            return None
+
+    def warm_up(self) -> None:
+        """Open the pooled connections with a one-token request so the first real call is hot."""
+        probe = self.llm.bind(max_tokens=1)
+        try:
+            probe.invoke("ping")
+            run(probe.ainvoke("ping"), timeout=30)
+        except Exception as e:
+            logger.warning("LLM warm-up failed: %s", e)
+
+    def close(self) -> None:
+        """Release the pooled HTTP clients."""
+        self._http_sync.close()
+        if not self._http.is_closed:
+            run(self._http.aclose(), timeout=5)
+
     def extract_jobs(self, cleaned_text: str) -> List[Dict[str, Any]]:
         """Extract structured job listings from text."""
+        chunks, keys, contents = self._prepare_extraction(cleaned_text)
+        with safe_execution(logger, "extract_jobs"):
+            pending = [i for i, content in enumerate(contents) if content is None]
+            if pending:
+                responses = self._extract_chain.batch(
+                    [{"page_data": chunks[i]} for i in pending],
+                    config={"max_concurrency": self.MAX_CONCURRENCY},
+                )
+                for i, response in zip(pending, responses):
+                    contents[i] = response.content
+            return self._finish_extraction(keys, contents, pending)
+
+    async def aextract_jobs(self, cleaned_text: str) -> List[Dict[str, Any]]:
+        """Asynchronously extract job listings, mapping page chunks concurrently."""
+        # Tokenizing, cache I/O (possibly Redis) and parsing block, so keep them off the event loop.
+        chunks, keys, contents = await asyncio.to_thread(self._prepare_extraction, cleaned_text)
+        with safe_execution(logger, "aextract_jobs"):
+            pending = [i for i, content in enumerate(contents) if content is None]
+            if pending:
+                responses = await self._extract_chain.abatch(
+                    [{"page_data": chunks[i]} for i in pending],
+                    config={"max_concurrency": self.MAX_CONCURRENCY},
+                )
+                for i, response in zip(pending, responses):
+                    contents[i] = response.content
+            return await asyncio.to_thread(self._finish_extraction, keys, contents, pending)
+
+    def _prepare_extraction(self, cleaned_text: str) -> Tuple[List[str], List[str], List[Optional[str]]]:
+        """Split page text into chunks and look up any cached extraction for each."""
         if not cleaned_text.strip():
             raise ValueError("Cleaned text cannot be empty.")
 
-        with safe_execution(logger, "extract_jobs"):
-            response = (self._JOB_PROMPT | self.llm).invoke({"page_data": cleaned_text})
-            result = self._parser.parse(response.content)
-            jobs = result if isinstance(result, list) else [result]
-            logger.info(f"Extracted {len(jobs)} job(s).")
-            return jobs
+        chunks = self._split_page(cleaned_text)
+        keys = [make_key("extract_jobs", self._JOB_INSTRUCTION, chunk) for chunk in chunks]
+        contents = [self._cache.get(key) for key in keys]
+        if all(content is not None for content in contents):
+            logger.info("Using cached job extraction.")
+        return chunks, keys, contents
+
+    def _finish_extraction(self, keys: List[str], contents: List[str],
+                           missed: List[int]) -> List[Dict[str, Any]]:
+        """Parse each chunk's response, cache the fresh ones, then merge the jobs found."""
+        missed_set = set(missed)
+        results = []
+        for i, (key, content) in enumerate(zip(keys, contents)):
+            results.append(self._parse_jobs(content))
+            if i in missed_set:
+                self._cache.set(key, content)
+        # Only chunk overlaps can repeat a job; a single chunk is returned as extracted.
+        jobs = self._merge_jobs(results) if len(results) > 1 else results[0]
+        logger.info("Extracted %d job(s).", len(jobs))
+        return jobs
+
+    @staticmethod
+    def _merge_jobs(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Flatten per-chunk extraction results, dropping jobs repeated across chunk overlaps."""
+        jobs: List[Dict[str, Any]] = []
+        seen = set()
+        for result in results:
+            for job in result:
+                key = msgspec.json.encode(
+                    {field: _normalize(value) for field, value in job.items()}, order="sorted"
+                )
+                if key not in seen:
+                    seen.add(key)
+                    jobs.append(job)
+        return jobs
+
+    @staticmethod
+    def _parse_jobs(content: str) -> List[Dict[str, Any]]:
+        """Decode the jobs in an LLM response, tolerating Markdown fences and skipping malformed jobs."""
+        text = content.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+        starts = [i for i in (text.find("["), text.find("{")) if i != -1]
+        end = max(text.rfind("]"), text.rfind("}"))
+        for candidate in (text, text[min(starts):end + 1] if starts else ""):
+            try:
+                decoded = msgspec.json.decode(candidate)
+            except msgspec.DecodeError:
+                continue
+            return Chain._coerce_jobs(decoded, content)
+        raise OutputParserException("LLM response is not a valid job JSON.", llm_output=content)
+
+    @staticmethod
+    def _coerce_jobs(decoded: Any, content: str) -> List[Dict[str, Any]]:
+        """Validate decoded JSON job by job, so one odd job does not discard the page."""
+        if isinstance(decoded, dict) and not decoded.keys() & set(Job.__struct_fields__):
+            # Unwrap {"jobs": [...]}-style envelopes instead of reading them as one blank job.
+            lists = [value for value in decoded.values() if isinstance(value, list)]
+            if len(lists) != 1:
+                raise OutputParserException("LLM response has no job list.", llm_output=content)
+            decoded = lists[0]
+
+        jobs = []
+        for item in decoded if isinstance(decoded, list) else [decoded]:
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get("skills"), list):
+                item["skills"] = [name for name in map(_skill_name, item["skills"]) if name]
+            try:
+                # Keep extra fields such as company or location; they give the email prompt context.
+                job = {**item, **msgspec.structs.asdict(msgspec.convert(item, type=Job))}
+            except msgspec.ValidationError as e:
+                logger.warning("Skipping malformed job: %s", e)
+                continue
+            job["role"] = job["role"] or ""
+            job["description"] = job["description"] or ""
+            if not job["role"] and not job["description"]:
+                continue
+            if not isinstance(job["skills"], list):
+                job["skills"] = [t for s in (job["skills"] or "").split(",") if (t := s.strip())]
+            jobs.append(job)
+        return jobs
+
+    def _split_page(self, text: str) -> List[str]:
+        """Split page text into overlapping windows that fit the model's context budget."""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text)
+            if len(tokens) <= self.MAX_PAGE_TOKENS:
+                return [text]
+            step = self.CHUNK_TOKENS - self.CHUNK_OVERLAP
+            chunks = [
+                self._encoding.decode(tokens[i:i + self.CHUNK_TOKENS])
+                for i in range(0, len(tokens) - self.CHUNK_OVERLAP, step)
+            ]
+        else:
+            if len(text) <= self.MAX_PAGE_TOKENS * self.CHARS_PER_TOKEN:
+                return [text]
+            size = self.CHUNK_TOKENS * self.CHARS_PER_TOKEN
+            overlap = self.CHUNK_OVERLAP * self.CHARS_PER_TOKEN
+            chunks = [text[i:i + size] for i in range(0, len(text) - overlap, size - overlap)]
+
+        logger.info("Split %d characters of page text into %d chunk(s).", len(text), len(chunks))
+        return chunks
+
+    def _mail_key(self, job: Dict[str, Any], links: List[Dict[str, Any]]) -> str:
+        """Cache key for an email generated from a job and its portfolio links."""
+        return make_key("write_mail", self._EMAIL_INSTRUCTION, str(job), links)
 
     def write_mail(self, job: Dict[str, Any], links: List[Dict[str, Any]]) -> str:
         """Generate a cold email for a given job posting."""
         if not job:
             raise ValueError("Job data is required to generate an email.")
 
+        key = self._mail_key(job, links)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
         with safe_execution(logger, "write_mail"):
-            response = (self._EMAIL_PROMPT | self.llm).invoke({
+            response = self._email_chain.invoke({
                 "job_description": str(job),
                 "link_list": links
             })
-            logger.info(f"Generated email for: {job.get('role', 'Unknown')}")
-            return response.content.strip()
+            logger.info("Generated email for: %s", job.get("role", "Unknown"))
+            email = response.content.strip()
+            self._cache.set(key, email)
+            return email
+
+    async def awrite_mail(self, job: Dict[str, Any], links: List[Dict[str, Any]]) -> str:
+        """Asynchronously generate a cold email for a given job posting."""
+        if not job:
+            raise ValueError("Job data is required to generate an email.")
+
+        key = self._mail_key(job, links)
+        cached = await asyncio.to_thread(self._cache.get, key)
+        if cached is not None:
+            return cached
+
+        with safe_execution(logger, "awrite_mail"):
+            response = await self._email_chain.ainvoke({
+                "job_description": str(job),
+                "link_list": links
+            })
+            logger.info("Generated email for: %s", job.get("role", "Unknown"))
+            email = response.content.strip()
+            await asyncio.to_thread(self._cache.set, key, email)
+            return email
+
+    def stream_mail(self, job: Dict[str, Any], links: List[Dict[str, Any]]) -> Iterator[str]:
+        """Stream a cold email for a given job posting chunk by chunk."""
+        if not job:
+            raise ValueError("Job data is required to generate an email.")
+
+        key = self._mail_key(job, links)
+        cached = self._cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        with safe_execution(logger, "stream_mail"):
+            parts = []
+            for chunk in self._email_chain.stream({
+                "job_description": str(job),
+                "link_list": links
+            }):
+                parts.append(chunk.content)
+                yield chunk.content
+            logger.info("Streamed email for: %s", job.get("role", "Unknown"))
+            self._cache.set(key, "".join(parts).strip())
@@ -0,0 +1,193 @@
+"""Cold email generation workflow: fetch, extract, match and write."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Iterator, Tuple, Union
+import numpy as np
+from cachetools import TTLCache
+from diskcache import Cache
+
+from async_runner import run, run_cpu_bound, submit
+from chains import Chain
+from embeddings import encode
+from portfolio import Portfolio
+from semantic_cache import SemanticCache, job_text
+from utils import clean_text
+from web_fetch import fetch, fetch_validator
+from logger_utils import get_logger, safe_execution, validate_non_empty
+
+logger = get_logger("EmailGenerator")
+
+PAGE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "cme_web")
+PAGE_CACHE_TTL = 3600
+
+# Module-level so every Streamlit session shares the page caches and one SQLite handle.
+_page_cache = Cache(PAGE_CACHE_DIR)
+_recent_pages: TTLCache = TTLCache(maxsize=256, ttl=PAGE_CACHE_TTL)
+_recent_pages_lock = threading.Lock()
+
+
+class EmailGenerator:
+    """Handles complete cold email generation workflow over a loaded portfolio."""
+
+    def __init__(self, llm: Chain, portfolio: Portfolio,
+                 semantic_cache: Optional[SemanticCache] = None):
+        self.llm = llm
+        self.portfolio = portfolio
+        self.semantic_cache = semantic_cache
+
+    def load_web_content(self, url: str) -> str:
+        """Fetch and clean webpage content."""
+        url = validate_non_empty(url, "URL")
+        with _recent_pages_lock:
+            content = _recent_pages.get(url)
+        if content is not None:
+            logger.info("Using in-memory content for %s", url)
+            return content
+
+        with safe_execution(logger, "load_web_content"):
+            content = run(self._afetch_content(url))
+            with _recent_pages_lock:
+                _recent_pages[url] = content
+            return content
+
+    async def _afetch_content(self, url: str) -> str:
+        """Return cleaned page text, reusing the disk cache while the page is unchanged."""
+        validator = await fetch_validator(url)
+        key = (hashlib.sha1(url.encode("utf-8")).hexdigest(), validator)
+        cached = await asyncio.to_thread(_page_cache.get, key)
+        if cached is not None:
+            logger.info("Using cached content for %s", url)
+            return cached
+
+        page_text = await fetch(url)
+        if not page_text.strip():
+            raise ValueError("No content fetched from the provided URL.")
+        content = await run_cpu_bound(clean_text, page_text)
+        await asyncio.to_thread(_page_cache.set, key, content, expire=PAGE_CACHE_TTL)
+        logger.info("Fetched %d characters from %s", len(content), url)
+        return content
+
+    def generate_emails(self, jobs: List[Dict]) -> List[Optional[str]]:
+        """Generate one email per job, with None in place of any that failed."""
+        if not jobs:
+            raise ValueError("No jobs provided for email generation.")
+
+        logger.info("Generating %d email(s)...", len(jobs))
+        results = run(self._generate_all(jobs))
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if len(failures) == len(results):
+            raise failures[0]
+        if failures:
+            logger.warning("%d of %d email(s) failed to generate.", len(failures), len(results))
+        return [None if isinstance(r, BaseException) else r for r in results]
+
+    @staticmethod
+    def _dedupe_jobs(jobs: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        """Return the unique jobs and, for each input job, the index of its unique copy."""
+        unique_jobs: List[Dict] = []
+        positions: List[int] = []
+        seen: Dict[Tuple[str, str, str, Tuple[str, ...]], int] = {}
+        for job in jobs:
+            skills = job.get("skills", [])
+            skills = skills if isinstance(skills, list) else [skills]
+            key = (
+                str(job.get("role", "")),
+                str(job.get("experience", "")),
+                str(job.get("description", "")),
+                tuple(sorted(map(str, skills))),
+            )
+            if key not in seen:
+                seen[key] = len(unique_jobs)
+                unique_jobs.append(job)
+            positions.append(seen[key])
+        return unique_jobs, positions
+
+    def submit_emails(self, jobs: List[Dict],
+                      links_list: List[List[Dict]]) -> "Future[List[Union[str, BaseException]]]":
+        """Start generating emails in the background and return a future for the results."""
+        return submit(self._generate_all(jobs, links_list))
+
+    async def _generate_all(self, jobs: List[Dict], links_list: Optional[List[List[Dict]]] = None
+                            ) -> List[Union[str, BaseException]]:
+        """Generate all emails concurrently, returning failures in place of emails."""
+        all_jobs = jobs
+        jobs, positions = self._dedupe_jobs(all_jobs)
+        if len(jobs) < len(all_jobs):
+            logger.info("Skipped %d duplicate job(s).", len(all_jobs) - len(jobs))
+            if links_list is not None:
+                first_seen: Dict[int, int] = {}
+                for j, p in enumerate(positions):
+                    first_seen.setdefault(p, j)
+                links_list = [links_list[first_seen[p]] for p in range(len(jobs))]
+        if links_list is None:
+            links_list = await asyncio.to_thread(self.find_links, jobs)
+        embeddings = [None] * len(jobs)
+        if self.semantic_cache is not None:
+            embeddings = list(await asyncio.to_thread(encode, [job_text(job) for job in jobs]))
+
+        semaphore = asyncio.Semaphore(self.llm.MAX_CONCURRENCY)
+        results = await asyncio.gather(*[
+            self._awrite_single(job, links, embedding, i, semaphore)
+            for i, (job, links, embedding) in enumerate(zip(jobs, links_list, embeddings), start=1)
+        ], return_exceptions=True)
+        return [results[i] for i in positions]
+
+    async def _awrite_single(self, job: Dict, links: List[Dict], embedding: Optional[np.ndarray],
+                             index: int, semaphore: asyncio.Semaphore) -> str:
+        """Generate one email once a concurrency slot is available."""
+        if embedding is not None:
+            cached = self.semantic_cache.lookup(embedding)
+            if cached is not None:
+                logger.info("Reusing email of a similar job for: %s", job.get("role", "Unknown"))
+                return cached
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Links for %s: %s", job.get("role", "Unknown"),
+                         [link.get("links") for link in links if isinstance(link, dict)])
+
+        async with semaphore:
+            with safe_execution(logger, f"generate_email_{index}"):
+                email = await self.llm.awrite_mail(job, links)
+        if embedding is not None:
+            await asyncio.to_thread(self.semantic_cache.add, embedding, email)
+        return email
+
+    def find_links(self, jobs: List[Dict]) -> List[List[Dict]]:
+        """Look up portfolio links for every job in one vector search."""
+        return self.portfolio.query_links_batch([job.get("skills", []) for job in jobs])
+
+    def stream_email(self, job: Dict, links: List[Dict]) -> Iterator[str]:
+        """Stream the email for a single job as it is generated."""
+        embedding = None
+        if self.semantic_cache is not None:
+            embedding = encode([job_text(job)])[0]
+            cached = self.semantic_cache.lookup(embedding)
+            if cached is not None:
+                logger.info("Reusing email of a similar job for: %s", job.get("role", "Unknown"))
+                yield cached
+                return
+
+        parts = []
+        for chunk in self.llm.stream_mail(job, links):
+            parts.append(chunk)
+            yield chunk
+        if embedding is not None:
+            self.semantic_cache.add(embedding, "".join(parts).strip())
+
+    def extract_jobs(self, url: str) -> List[Dict]:
+        """Fetch a job page and extract its listings."""
+        content = self.load_web_content(url)
+        jobs = run(self.llm.aextract_jobs(content))
+        if not jobs:
+            raise ValueError("No job listings found on the given page.")
+        return jobs
+
+    def process_url(self, url: str) -> List[Optional[str]]:
+        """Extract jobs and generate corresponding emails."""
+        return self.generate_emails(self.extract_jobs(url))
@@ -0,0 +1,41 @@
+"""Shared sentence-embedding model for similarity lookups."""
+
+import os
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from logger_utils import get_logger
+
+logger = get_logger("Embeddings")
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# Dynamically quantized int8 export shipped with the model; VNNI/AMX CPUs run it fastest.
+# Override with EMBEDDING_ONNX_FILE, read when the encoder loads so .env values apply.
+DEFAULT_QUANTIZED_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+@lru_cache(maxsize=1)
+def get_encoder() -> SentenceTransformer:
+    """Load the embedding model once per process, preferring the int8 ONNX export."""
+    model_file = os.getenv("EMBEDDING_ONNX_FILE", DEFAULT_QUANTIZED_MODEL_FILE)
+    try:
+        return SentenceTransformer(
+            EMBEDDING_MODEL,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": model_file, "provider": "CPUExecutionProvider"},
+        )
+    except Exception as e:
+        logger.warning("Quantized ONNX encoder unavailable (%s); using float32 model.", e)
+        return SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+
+def encode(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """Embed texts as L2-normalized float32 vectors."""
+    return get_encoder().encode(
+        texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+    )
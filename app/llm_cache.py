@@ -0,0 +1,82 @@
+"""Response cache for LLM calls, in-process with an optional Redis backend."""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from logger_utils import get_logger
+
+try:
+    import redis
+except ImportError:  # Redis backend is optional.
+    redis = None
+
+logger = get_logger("LLMCache")
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Build a stable cache key from a namespace and the inputs of a call."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+class LLMCache:
+    """LRU cache for raw LLM responses, shared with Redis when REDIS_URL is set."""
+
+    def __init__(self, maxsize: int = 512, ttl: int = 86400, redis_url: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = self._init_redis(redis_url or os.getenv("REDIS_URL"))
+
+    @staticmethod
+    def _init_redis(url: Optional[str]):
+        """Connect to Redis if configured and available."""
+        if not url:
+            return None
+        if redis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed.")
+            return None
+        return redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, checking memory before Redis."""
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                return self._local[key]
+
+        if self._redis is None:
+            return None
+        try:
+            value = self._redis.get(key)
+        except redis.RedisError as e:
+            logger.warning("Redis lookup failed: %s", e)
+            return None
+        if value is not None:
+            self._store_local(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a response in memory and, when configured, in Redis."""
+        self._store_local(key, value)
+        if self._redis is None:
+            return
+        try:
+            self._redis.setex(key, self.ttl, value)
+        except redis.RedisError as e:
+            logger.warning("Redis write failed: %s", e)
+
+    def _store_local(self, key: str, value: str) -> None:
+        """Insert into the in-process LRU, evicting the oldest entry when full."""
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            if len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
@@ -2,72 +2,48 @@
 
 from typing import List, Dict, Optional
 import streamlit as st
-from langchain_community.document_loaders import WebBaseLoader
+from dotenv import load_dotenv
 
 from chains import Chain
+from email_generator import EmailGenerator
 from portfolio import Portfolio
-from utils import clean_text
-from logger_utils import get_logger, safe_execution, validate_non_empty
+from semantic_cache import SemanticCache
+from logger_utils import get_logger
 
+load_dotenv()
 logger = get_logger("ColdEmailApp")
 
 
-class EmailGenerator:
-    """Handles complete cold email generation workflow."""
-
-    def __init__(self, llm: Chain, portfolio: Portfolio):
-        self.llm = llm
-        self.portfolio = portfolio
-        self._portfolio_loaded = False
-
-    def _ensure_portfolio_loaded(self):
-        """Load portfolio once for session."""
-        if not self._portfolio_loaded:
-            logger.info("Loading portfolio into ChromaDB...")
-            self.portfolio.load_portfolio()
-            self._portfolio_loaded = True
-
-    def load_web_content(self, url: str) -> str:
-        """Fetch and clean webpage content."""
-        url = validate_non_empty(url, "URL")
-        with safe_execution(logger, "load_web_content"):
-            loader = WebBaseLoader([url])
-            docs = loader.load()
-            if not docs:
-                raise ValueError("No content fetched from the provided URL.")
-            content = clean_text(docs[0].page_content)
-            logger.info(f"Fetched {len(content)} characters from {url}")
-            return content
-
-    def generate_emails(self, jobs: List[Dict]) -> List[str]:
-        """Generate emails for given jobs."""
-        if not jobs:
-            raise ValueError("No jobs provided for email generation.")
-        self._ensure_portfolio_loaded()
-
-        logger.info(f"Generating {len(jobs)} email(s)...")
-        emails = []
-
-        for i, job in enumerate(jobs, start=1):
-            with safe_execution(logger, f"generate_email_{i}"):
-                links = self.portfolio.query_links(job.get("skills", []))
-                email = self.llm.write_mail(job, links)
-                emails.append(email)
-        return emails
-
-    def process_url(self, url: str) -> List[str]:
-        """Extract jobs and generate corresponding emails."""
-        content = self.load_web_content(url)
-        jobs = self.llm.extract_jobs(content)
-        if not jobs:
-            raise ValueError("No job listings found on the given page.")
-        return self.generate_emails(jobs)
+# ──────────────── Streamlit UI Layer ────────────────
+@st.cache_resource
+def get_chain() -> Chain:
+    """Share one warmed-up LLM chain (and its HTTP clients) across all sessions."""
+    chain = Chain()
+    chain.warm_up()
+    return chain
+
+
+@st.cache_resource
+def get_portfolio() -> Portfolio:
+    """Share one loaded portfolio and ChromaDB client across all sessions."""
+    portfolio = Portfolio()
+    logger.info("Loading portfolio into ChromaDB...")
+    portfolio.load_portfolio()
+    portfolio.warm_up()
+    return portfolio
+
+
+@st.cache_resource
+def get_semantic_cache() -> SemanticCache:
+    """Share one semantic email cache across all sessions."""
+    return SemanticCache()
 
 
-# ──────────────── Streamlit UI Layer ────────────────
 def init_session():
     if "generator" not in st.session_state:
-        st.session_state.generator = EmailGenerator(Chain(), Portfolio())
+        st.session_state.generator = EmailGenerator(
+            get_chain(), get_portfolio(), get_semantic_cache()
+        )
 
 
 def render_header():
@@ -86,18 +62,62 @@ def render_input() -> Optional[str]:
         return url.strip() if submitted and url else None
 
 
-def render_emails(emails: List[str]):
-    st.success(f"✅ Generated {len(emails)} email(s).")
+def render_download(email: str, i: int):
+    st.download_button(
+        "Download Email",
+        email,
+        file_name=f"email_{i}.txt",
+        mime="text/plain",
+        key=f"dl_{i}"
+    )
+
+
+def render_emails(jobs: List[Dict], generator: EmailGenerator):
+    links_list = generator.find_links(jobs)
+    # Generate the remaining emails concurrently while the first one streams in.
+    pending = generator.submit_emails(jobs[1:], links_list[1:]) if len(jobs) > 1 else None
+
+    try:
+        live = st.empty()
+        with live.container():
+            with st.expander("📩 Email 1", expanded=True):
+                emails: List[Optional[str]] = [stream_first_email(jobs[0], links_list[0], generator)]
+            if pending is not None:
+                with st.spinner("🔄 Finishing remaining emails..."):
+                    emails += [None if isinstance(r, BaseException) else r for r in pending.result()]
+        live.empty()
+    except BaseException:
+        # Stop paying for background LLM calls whose results can no longer be shown.
+        if pending is not None:
+            pending.cancel()
+        raise
+
+    st.session_state.last_emails = emails
+    render_saved_emails()
+
+
+def stream_first_email(job: Dict, links: List[Dict], generator: EmailGenerator) -> Optional[str]:
+    """Stream the first email live, returning None if it fails like the other jobs do."""
+    try:
+        return st.write_stream(generator.stream_email(job, links))
+    except Exception as e:
+        logger.error("Streaming the first email failed: %s", e)
+        return None
+
+
+@st.fragment
+def render_saved_emails():
+    """Render the last generated emails; download clicks rerun only this fragment."""
+    emails = st.session_state.get("last_emails", [])
     for i, email in enumerate(emails, start=1):
         with st.expander(f"📩 Email {i}", expanded=(i == 1)):
+            if email is None:
+                st.error("❌ Could not generate this email.")
+                continue
             st.markdown(email)
-            st.download_button(
-                "Download Email",
-                email,
-                file_name=f"email_{i}.txt",
-                mime="text/plain",
-                key=f"dl_{i}"
-            )
+            render_download(email, i)
+    generated = sum(email is not None for email in emails)
+    st.success(f"✅ Generated {generated} email(s).")
 
 
 def handle_error(error: Exception):
@@ -112,12 +132,12 @@ def handle_error(error: Exception):
 
 
 def process_submission(url: str, generator: EmailGenerator):
-    with st.spinner("🔄 Processing..."):
-        try:
-            emails = generator.process_url(url)
-            render_emails(emails)
-        except Exception as e:
-            handle_error(e)
+    try:
+        with st.spinner("🔄 Processing..."):
+            jobs = generator.extract_jobs(url)
+        render_emails(jobs, generator)
+    except Exception as e:
+        handle_error(e)
 
 
 def main():
@@ -134,6 +154,8 @@ def main():
     url = render_input()
     if url:
         process_submission(url, st.session_state.generator)
+    elif st.session_state.get("last_emails"):
+        render_saved_emails()
 
     st.divider()
     st.caption("Built with Streamlit & LangChain | Powered by AI")
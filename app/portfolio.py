@@ -1,74 +1,402 @@
 """Portfolio management for ChromaDB vector storage."""
 
+import base64
+import gc
+import hashlib
 import os
-import uuid
-from typing import List, Dict, Any
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import hnswlib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import chromadb as db
 
+from embeddings import EMBEDDING_DIM, encode
 from logger_utils import get_logger, safe_execution
 
 logger = get_logger("Portfolio")
 
+# Cell values pandas' read_csv would have parsed as missing, compared case-insensitively.
+NULL_TOKENS = ["", "nan", "-nan", "n/a", "na", "#n/a", "null", "none", "<na>"]
+
+
+@lru_cache(maxsize=1)
+def _get_client(path: str) -> db.ClientAPI:
+    """Open the persistent ChromaDB client once per process; opening it loads the on-disk index."""
+    return db.PersistentClient(path=path)
+
+
+@lru_cache(maxsize=None)
+def _get_collection(client: db.ClientAPI, name: str, m: int, ef_construction: int, ef_search: int):
+    """Retrieve or create a ChromaDB collection, reusing the handle across Portfolio instances."""
+    # HNSW settings only take effect when the collection is first created.
+    metadata = {
+        "hnsw:space": "cosine",
+        "hnsw:M": m,
+        "hnsw:construction_ef": ef_construction,
+        "hnsw:search_ef": ef_search,
+        "hnsw:batch_size": 1000,
+        "hnsw:sync_threshold": 10000,
+    }
+    # Vectors are computed with the shared encoder, so Chroma needs no embedding function.
+    return client.get_or_create_collection(name, metadata=metadata, embedding_function=None)
+
 
 class Portfolio:
     """Manages portfolio projects with ChromaDB."""
 
-    def __init__(self, file_path: str = "app/resources/my_portfolio.csv"):
+    VECTOR_STORE_PATH = "VectorStore"
+    COLLECTION_NAME = "portfolio"
+    BATCH_SIZE = 2500
+    ENCODE_BATCH_SIZE = 128
+    ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+    COLUMNS = ["Techstack", "Links"]
+    QUERY_CACHE_SIZE = 128
+    NUMPY_MAX_ROWS = 10_000
+    HNSW_M = 16
+    HNSW_EF_CONSTRUCTION = 64
+    HNSW_EF_SEARCH = 32
+
+    def __init__(self, file_path: str = "app/resources/my_portfolio.csv", mega_batch: int = 10000):
         self.file_path = file_path
+        self.mega_batch = mega_batch
         self.data = self._load_csv()
-        self.chroma_client = self._init_client()
-        self.collection = self._get_or_create_collection("portfolio")
+        self.chroma_client = _get_client(self.VECTOR_STORE_PATH)
+        self.collection = _get_collection(
+            self.chroma_client, self.COLLECTION_NAME,
+            self.HNSW_M, self.HNSW_EF_CONSTRUCTION, self.HNSW_EF_SEARCH,
+        )
+        self._index: Optional[hnswlib.Index] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._metadatas: List[Dict[str, Any]] = []
+        self._query_cache: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def _load_csv(self) -> pd.DataFrame:
-        """Load and validate CSV portfolio file."""
+        """Load and validate the portfolio file, preferring a columnar Parquet copy."""
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"Portfolio file not found: {self.file_path}")
 
-        data = pd.read_csv(self.file_path)
-        if data.empty or not {"Techstack", "Links"}.issubset(data.columns):
+        try:
+            if self.file_path.endswith(".parquet"):
+                data = pd.read_parquet(self.file_path, columns=self.COLUMNS, engine="pyarrow")
+            elif self._parquet_cache_is_fresh(file_hash := self._file_hash()):
+                data = pd.read_parquet(
+                    self._parquet_cache_path(), columns=self.COLUMNS, engine="pyarrow"
+                )
+            else:
+                # Memory-map the file and declare both columns as plain strings, skipping
+                # type inference and null detection; blank and null-like cells in either
+                # column are filtered by _valid_rows.
+                with pa.memory_map(self.file_path) as source:
+                    table = pa_csv.read_csv(
+                        source,
+                        convert_options=pa_csv.ConvertOptions(
+                            include_columns=self.COLUMNS,
+                            column_types={column: pa.string() for column in self.COLUMNS},
+                            strings_can_be_null=False,
+                        ),
+                    )
+                self._convert_to_parquet_cache(table, file_hash)
+                data = table.to_pandas(types_mapper=pd.ArrowDtype)
+        except (pa.ArrowInvalid, KeyError) as e:
+            raise ValueError("Portfolio CSV must contain 'Techstack' and 'Links' columns.") from e
+
+        if data.empty:
             raise ValueError("Portfolio CSV must contain 'Techstack' and 'Links' columns.")
 
-        return data.dropna(subset=["Techstack", "Links"])
+        return data.dropna(subset=self.COLUMNS)
 
-    @staticmethod
-    def _init_client() -> db.Client:
-        """Initialize persistent ChromaDB client."""
-        return db.PersistentClient(path="VectorStore")
+    def _parquet_cache_path(self) -> str:
+        """Path of the Parquet sidecar kept next to the CSV."""
+        return os.path.splitext(self.file_path)[0] + ".parquet"
+
+    def _parquet_cache_is_fresh(self, file_hash: str) -> bool:
+        """Whether the Parquet sidecar was written from the CSV's current contents."""
+        cache_path = self._parquet_cache_path()
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            metadata = pq.read_schema(cache_path).metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return False
+        # Compare content hashes, not mtimes: copies and archives can keep an older mtime.
+        return metadata.get(b"source_hash") == file_hash.encode()
 
-    def _get_or_create_collection(self, name: str):
-        """Retrieve or create a ChromaDB collection."""
-        return self.chroma_client.get_or_create_collection(name)
+    def _convert_to_parquet_cache(self, table: pa.Table, file_hash: str) -> None:
+        """Write a Parquet sidecar, stamped with the CSV's hash, so later startups skip CSV parsing."""
+        cache_path = self._parquet_cache_path()
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), b"source_hash": file_hash.encode()}
+        )
+        try:
+            tmp_path = cache_path + ".tmp"
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning("Could not write Parquet cache: %s", e)
+
+    def _file_hash(self) -> str:
+        """Fingerprint the portfolio file so unchanged data is never re-embedded."""
+        with open(self.file_path, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
 
     def load_portfolio(self) -> None:
-        """Load portfolio data into vector DB if not already loaded."""
-        if self.collection.count() > 0:
+        """Load portfolio data into vector DB unless the stored copy is current."""
+        file_hash = self._file_hash()
+        if (self.collection.metadata or {}).get("source_hash") == file_hash:
+            self.data = None
             return
 
-        records = [
-            (
-                str(row["Techstack"]).strip(),
-                {"links": str(row["Links"]).strip()},
-                str(uuid.uuid4()),
-            )
-            for _, row in self.data.iterrows()
-            if pd.notna(row["Techstack"]) and pd.notna(row["Links"])
-        ]
+        df = self._valid_rows(self.data if self.data is not None else self._load_csv())
+        # The rows now live in Chroma; keeping the frame would only pin the whole CSV in memory.
+        self.data = None
+        df = df.assign(id=[self._row_id(tech, links) for tech, links in zip(df["Techstack"], df["Links"])])
+        df = df.drop_duplicates(subset="id")
 
         with safe_execution(logger, "load_portfolio"):
-            self.collection.add(
-                documents=[tech for tech, _, _ in records],
-                metadatas=[meta for _, meta, _ in records],
-                ids=[uid for _, _, uid in records],
-            )
-            logger.info(f"Loaded {len(records)} portfolio entries..")
-
-    def query_links(self, skills: List[str], n_results: int = 2) -> List[Dict[str, Any]]:
-        """Retrieve project links relevant to provided skills."""
-        valid_skills = [s.strip() for s in skills if s and isinstance(s, str) and s.strip()]
+            # Content-hash IDs make reloads incremental: only new rows are embedded, and upserting
+            # them stays idempotent if another process synced the same rows in the meantime.
+            existing = set(self.collection.get(include=[])["ids"])
+            stale = list(existing.difference(df["id"]))
+            for start in range(0, len(stale), self.BATCH_SIZE):
+                self.collection.delete(ids=stale[start:start + self.BATCH_SIZE])
+            df = df[~df["id"].isin(existing)]
+            total = len(df)
+
+            # Mega-batches bound peak memory to one batch of documents and embeddings.
+            for start in range(0, total, self.mega_batch):
+                sub = df.iloc[start:start + self.mega_batch]
+                documents = sub["Techstack"].tolist()
+                metadatas = [{"links": link} for link in sub["Links"].tolist()]
+                ids = sub["id"].tolist()
+                self._add_batches(documents, metadatas, ids)
+                del sub, documents, metadatas, ids
+                gc.collect()
+                logger.info("Loaded %d/%d new portfolio entries..", min(start + self.mega_batch, total), total)
+
+            # Chroma rejects re-sending hnsw:space, and modify replaces the whole metadata dict.
+            metadata = {k: v for k, v in (self.collection.metadata or {}).items() if k != "hnsw:space"}
+            self.collection.modify(metadata={**metadata, "source_hash": file_hash})
+            self._index = self._matrix = None
+            if stale:
+                logger.info("Removed %d stale portfolio entries..", len(stale))
+
+    @staticmethod
+    def _valid_rows(data: pd.DataFrame) -> pd.DataFrame:
+        """Return rows with a usable tech stack and link, stripped with vectorized string ops."""
+        techstack = data["Techstack"].astype("string").str.strip()
+        links = data["Links"].astype("string").str.strip()
+        mask = (
+            techstack.notna() & ~techstack.str.lower().isin(NULL_TOKENS)
+            & links.notna() & ~links.str.lower().isin(NULL_TOKENS)
+        )
+        return pd.DataFrame({"Techstack": techstack[mask], "Links": links[mask]})
+
+    @staticmethod
+    def _row_id(tech: str, links: str) -> str:
+        """Derive a stable ID from a row's content so unchanged rows keep their ID."""
+        return hashlib.blake2b(f"{tech}|{links}".encode(), digest_size=16).hexdigest()
+
+    def _add_batches(self, documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str]) -> None:
+        """Embed slices in parallel and add them in order, overlapping Chroma writes with encoding."""
+        spans = [(start, start + self.BATCH_SIZE) for start in range(0, len(ids), self.BATCH_SIZE)]
+        pending: Optional[Future] = None
+        with ThreadPoolExecutor(max_workers=self.ENCODE_WORKERS, thread_name_prefix="encoder") as encoders, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer") as writer:
+            # ONNX Runtime releases the GIL, so slices encode concurrently; writes stay serialized for SQLite.
+            encoded = encoders.map(lambda span: self._encode_unique(documents[span[0]:span[1]]), spans)
+            for (start, end), embeddings in zip(spans, encoded):
+                quantized = self._quantize(embeddings)
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(
+                    self.collection.upsert,
+                    documents=documents[start:end],
+                    # Store the int8 grid values so Chroma's vectors match the persisted codes exactly.
+                    embeddings=(quantized.astype(np.float32) / 127.0).tolist(),
+                    metadatas=[
+                        {**meta, "q": base64.b64encode(code.tobytes()).decode("ascii")}
+                        for meta, code in zip(metadatas[start:end], quantized)
+                    ],
+                    ids=ids[start:end],
+                )
+            if pending is not None:
+                pending.result()
+
+    @staticmethod
+    def _quantize(embeddings: np.ndarray) -> np.ndarray:
+        """Quantize L2-normalized embeddings to int8 codes."""
+        return np.clip(np.round(embeddings * 127), -128, 127).astype(np.int8)
+
+    def _encode_unique(self, documents: List[str]) -> np.ndarray:
+        """Embed each distinct document once and fan the vectors back out to every row."""
+        unique, inverse = np.unique(np.asarray(documents, dtype=object), return_inverse=True)
+        return encode(unique.tolist(), batch_size=self.ENCODE_BATCH_SIZE)[inverse]
+
+    def query_links(self, skills: List[str], n_results: int = 2, fanout: bool = True) -> List[Dict[str, Any]]:
+        """Retrieve project links relevant to provided skills.
+
+        With ``fanout`` each skill is searched separately; otherwise the skills are
+        joined into one query, trading some recall for a single index traversal.
+        """
+        valid_skills = [t for s in skills if type(s) is str and (t := s.strip())]
         if not valid_skills:
             return []
 
         with safe_execution(logger, "query_links"):
-            result = self.collection.query(query_texts=valid_skills, n_results=n_results)
-            return result.get("metadatas", [])
+            if fanout:
+                return self._search(valid_skills, n_results)
+            return self._search([" ".join(valid_skills)], n_results * len(valid_skills))
+
+    def query_links_batch(self, skills_list: List[List[str]], n_results: int = 2) -> List[List[Dict[str, Any]]]:
+        """Retrieve project links for several skill lists with a single vector search."""
+        queries = [
+            " ".join(t for s in skills if type(s) is str and (t := s.strip()))
+            for skills in skills_list
+        ]
+        unique_queries = list(dict.fromkeys(query for query in queries if query))
+        if not unique_queries:
+            return [[] for _ in skills_list]
+
+        with safe_execution(logger, "query_links_batch"):
+            by_query = dict(zip(unique_queries, self._search(unique_queries, n_results)))
+            return [by_query.get(query, []) for query in queries]
+
+    def warm_up(self) -> None:
+        """Load the embedding model and build the query index ahead of the first request."""
+        self._ensure_index()
+        encode(["warmup"])
+
+    def _ensure_index(self) -> None:
+        """Build the in-memory search structure if it is not ready yet."""
+        if self._index is None and self._matrix is None:
+            self._build_index()
+
+    def _build_index(self) -> None:
+        """Build the in-memory search structure: a dense matrix for small portfolios, HNSW otherwise."""
+        source_hash = (self.collection.metadata or {}).get("source_hash", "")
+        snapshot = self._load_snapshot(source_hash)
+        if snapshot is not None:
+            embeddings, links = snapshot
+        else:
+            # Read the vectors already stored in Chroma instead of re-encoding the CSV.
+            stored = self.collection.get(include=["embeddings", "metadatas"])
+            embeddings = np.asarray(stored["embeddings"], dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            # Keep only the links; the base64 int8 codes are for reranking, not for prompts.
+            links = [meta["links"] for meta in stored["metadatas"]]
+            self._save_snapshot(source_hash, embeddings, links)
+
+        self._metadatas = [{"links": link} for link in links]
+        with self._cache_lock:
+            self._query_cache.clear()
+
+        if len(embeddings) < self.NUMPY_MAX_ROWS:
+            # Below ~10k rows one matrix product beats graph traversal and its per-query overhead.
+            self._matrix, self._index = embeddings, None
+            return
+
+        index = hnswlib.Index(space="cosine", dim=EMBEDDING_DIM)
+        index.init_index(
+            max_elements=len(embeddings), ef_construction=self.HNSW_EF_CONSTRUCTION, M=self.HNSW_M
+        )
+        index.add_items(embeddings, np.arange(len(embeddings)))
+        index.set_ef(self.HNSW_EF_SEARCH)
+        self._matrix, self._index = None, index
+
+    def _snapshot_path(self) -> str:
+        """Path of the embedding snapshot kept beside the Chroma store."""
+        return os.path.join(self.VECTOR_STORE_PATH, "portfolio_embs.npz")
+
+    def _load_snapshot(self, source_hash: str) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """Load the saved embedding matrix and links if they match the current portfolio."""
+        path = self._snapshot_path()
+        if not source_hash or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as snapshot:
+                if str(snapshot["source_hash"]) != source_hash:
+                    return None
+                # Stored vectors are int8 codes / 127, so the codes restore them exactly.
+                embeddings = np.ascontiguousarray(snapshot["codes"], dtype=np.float32) / 127.0
+                links = snapshot["links"].tolist()
+        except Exception as e:  # Any unreadable snapshot is just a miss; Chroma has the data.
+            logger.warning("Ignoring unreadable embedding snapshot: %s", e)
+            return None
+        if embeddings.shape != (len(links), EMBEDDING_DIM):
+            logger.warning("Ignoring embedding snapshot with mismatched shape %s.", embeddings.shape)
+            return None
+        return embeddings, links
+
+    def _save_snapshot(self, source_hash: str, embeddings: np.ndarray, links: List[str]) -> None:
+        """Save the embedding matrix as int8 codes so the next start skips reading Chroma."""
+        if not source_hash:
+            return
+        path = self._snapshot_path()
+        tmp_path = None
+        try:
+            # Write beside the target and rename, so readers never see a half-written zip.
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(path), prefix="portfolio_embs.", suffix=".tmp", delete=False
+            ) as tmp:
+                tmp_path = tmp.name
+                np.savez(
+                    tmp,
+                    source_hash=np.array(source_hash),
+                    codes=self._quantize(embeddings),
+                    links=np.array(links, dtype=str),
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write embedding snapshot: %s", e)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _nearest(self, vectors: np.ndarray, k: int) -> np.ndarray:
+        """Return the row ids of the k nearest portfolio entries for each query vector."""
+        if self._index is not None:
+            ids, _ = self._index.knn_query(vectors, k=k)
+            return ids
+        scores = vectors @ self._matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def _search(self, queries: List[str], n_results: int) -> List[List[Dict[str, Any]]]:
+        """Return the metadatas of the nearest portfolio entries for each query."""
+        self._ensure_index()
+        k = min(n_results, len(self._metadatas))
+        if k == 0:
+            return [[] for _ in queries]
+
+        # Exact-text hits skip the encoder, which is the only costly step of a search.
+        results = [self._cached_result(query, k) for query in queries]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            vectors = encode([queries[i] for i in misses])
+            for i, row in zip(misses, self._nearest(vectors, k)):
+                results[i] = [self._metadatas[j] for j in row]
+                self._cache_result(queries[i], k, results[i])
+        return results
+
+    def _cached_result(self, query: str, k: int) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached result of an identical earlier query, if any."""
+        with self._cache_lock:
+            result = self._query_cache.get((query, k))
+            if result is not None:
+                self._query_cache.move_to_end((query, k))
+            return result
+
+    def _cache_result(self, query: str, k: int, result: List[Dict[str, Any]]) -> None:
+        """Remember a query result, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._query_cache[(query, k)] = result
+            if len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
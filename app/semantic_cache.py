@@ -0,0 +1,112 @@
+"""Embedding-based cache that reuses emails for near-duplicate job postings."""
+
+import atexit
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import hnswlib
+import numpy as np
+import orjson
+
+from embeddings import EMBEDDING_DIM
+from logger_utils import get_logger
+
+logger = get_logger("SemanticCache")
+
+
+def job_text(job: Dict[str, Any]) -> str:
+    """Text used to compare job postings by meaning."""
+    skills = job.get("skills", [])
+    skills_text = " ".join(map(str, skills)) if isinstance(skills, list) else str(skills)
+    return f"{job.get('role', '')} {job.get('description', '')} {skills_text}".strip()
+
+
+class SemanticCache:
+    """HNSW index over job embeddings, persisted alongside the emails it maps to."""
+
+    FLUSH_INTERVAL = 30.0
+
+    def __init__(self, path: str = "cache", threshold: float = 0.92, max_elements: int = 10000):
+        self.threshold = threshold
+        self._index_file = os.path.join(path, "emails.hnsw")
+        self._store_file = os.path.join(path, "emails.json")
+        self._lock = threading.Lock()
+        self._emails: List[str] = []
+        self._index = hnswlib.Index(space="cosine", dim=EMBEDDING_DIM)
+        self._flush_timer: Optional[threading.Timer] = None
+        os.makedirs(path, exist_ok=True)
+        self._load(max_elements)
+        atexit.register(self.flush)
+
+    def _load(self, max_elements: int) -> None:
+        """Restore a persisted index, or start an empty one if it is missing or unreadable."""
+        if os.path.exists(self._index_file) and os.path.exists(self._store_file):
+            try:
+                with open(self._store_file, "rb") as f:
+                    emails = orjson.loads(f.read())
+                self._index.load_index(self._index_file, max_elements=max(max_elements, len(emails)))
+            except (OSError, RuntimeError, orjson.JSONDecodeError) as e:
+                logger.warning("Discarding unreadable email cache: %s", e)
+            else:
+                # Emails are written before the index, so a crash in between leaves extra emails,
+                # which are safe to drop; fewer emails than index ids means the files disagree.
+                count = self._index.get_current_count()
+                if isinstance(emails, list) and len(emails) >= count:
+                    self._emails = emails[:count]
+                    self._index.set_ef(32)
+                    logger.info("Loaded %d cached email(s).", count)
+                    return
+                logger.warning("Discarding email cache that does not match its %d index entries.", count)
+            self._index = hnswlib.Index(space="cosine", dim=EMBEDDING_DIM)
+        self._index.init_index(max_elements=max_elements, ef_construction=100, M=16)
+        self._index.set_ef(32)
+
+    def lookup(self, embedding: np.ndarray) -> Optional[str]:
+        """Return the email of the most similar cached job if it is close enough."""
+        with self._lock:
+            if not self._emails:
+                return None
+            ids, distances = self._index.knn_query(embedding, k=1)
+        if 1 - distances[0][0] < self.threshold:
+            return None
+        return self._emails[ids[0][0]]
+
+    def add(self, embedding: np.ndarray, email: str) -> None:
+        """Store an email under its job embedding; it is persisted by the next scheduled flush."""
+        with self._lock:
+            if len(self._emails) >= self._index.get_max_elements():
+                self._index.resize_index(2 * self._index.get_max_elements())
+            self._index.add_items(embedding, [len(self._emails)])
+            self._emails.append(email)
+            if self._flush_timer is None:
+                # Batch writes: one rewrite of both files per interval instead of per email.
+                self._flush_timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Persist pending additions, replacing each file atomically."""
+        with self._lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+            try:
+                _write_atomic(self._store_file, lambda tmp: _write_bytes(tmp, orjson.dumps(self._emails)))
+                _write_atomic(self._index_file, self._index.save_index)
+            except (OSError, RuntimeError) as e:
+                logger.warning("Could not persist email cache: %s", e)
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    """Write bytes to a file."""
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _write_atomic(path: str, write: Callable[[str], None]) -> None:
+    """Write a file through a temp path and rename it, so a crash never leaves it truncated."""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
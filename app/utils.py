@@ -1,16 +1,25 @@
 import re
 
-def clean_text(text):
+# Compiled once at import; clean_text runs on every fetched page.
+_HTML_TAG = re.compile(r'<[^>]*?>')
+_URL = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+_SPECIAL_CHARS = re.compile(r'[^a-zA-Z0-9\s]')
+# Single-pass table: separator-like characters become spaces, other control characters are dropped.
+_TRANSLATION = str.maketrans({
+    **{chr(c): None for c in range(0x20) if chr(c) not in '\t\n\r'},
+    **{c: ' ' for c in '\xa0\u200b\u2028\u2029\t\r\n'},
+})
+
+
+def clean_text(text: str) -> str:
+    """Strip markup, URLs and special characters from scraped page text."""
+    # Normalize separators and drop control characters in one C-level pass
+    text = text.translate(_TRANSLATION)
     # Remove HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
+    text = _HTML_TAG.sub('', text)
     # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-    # Remove special characters
-    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s{2,}', ' ', text)
-    # Trim leading and trailing whitespace
-    text = text.strip()
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
\ No newline at end of file
+    text = _URL.sub('', text)
+    # Remove special characters, keeping whitespace so words stay separated
+    text = _SPECIAL_CHARS.sub('', text)
+    # Collapse runs of spaces and trim leading and trailing whitespace
+    return ' '.join(text.split())
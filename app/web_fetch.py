@@ -0,0 +1,92 @@
+"""Asynchronous web page fetching and HTML text extraction."""
+
+import asyncio
+import atexit
+from typing import Optional
+
+import aiohttp
+import trafilatura
+from selectolax.parser import HTMLParser
+
+from async_runner import run, run_cpu_bound
+from logger_utils import get_logger
+
+logger = get_logger("WebFetch")
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=15)
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; ColdEmailGenerator/1.0)"}
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the pooled HTTP session, creating it on the current event loop."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300),
+            timeout=REQUEST_TIMEOUT,
+            headers=HEADERS,
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the pooled HTTP session if it was opened."""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+@atexit.register
+def _close_session_at_exit() -> None:
+    """Close the pooled session on the shared loop before the interpreter exits."""
+    if _session is not None and not _session.closed:
+        run(close_session(), timeout=5)
+
+
+async def fetch_html(url: str) -> str:
+    """Download the raw HTML of a page."""
+    session = await get_session()
+    try:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            return await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ConnectionError(f"Failed to fetch {url}: {e}") from e
+
+
+async def fetch_validator(url: str) -> str:
+    """Return the page's ETag or Last-Modified header, or an empty string."""
+    session = await get_session()
+    try:
+        async with session.head(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return ""
+            return response.headers.get("ETag") or response.headers.get("Last-Modified", "")
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return ""
+
+
+def html_to_text(html: str) -> str:
+    """Extract the visible text of an HTML document, minus page chrome."""
+    if not html.strip():
+        return ""
+    tree = HTMLParser(html)
+    for node in tree.css("script, style, noscript, nav, footer, header"):
+        node.decompose()
+    root = tree.body or tree.root
+    return root.text(separator="\n", strip=True) if root is not None else ""
+
+
+def extract_main_text(html: str) -> str:
+    """Extract the main content of a page, dropping navigation and boilerplate."""
+    text = trafilatura.extract(html, include_links=False, favor_precision=True)
+    if text:
+        logger.info("Extracted %d characters of main content from %d of HTML.", len(text), len(html))
+        return text
+    return html_to_text(html)
+
+
+async def fetch(url: str) -> str:
+    """Fetch a page and return its main text content."""
+    return await run_cpu_bound(extract_main_text, await fetch_html(url))